@@ -1,22 +1,39 @@
 #!/usr/bin/env python3
 import argparse
-import glob
+import base64
+import contextlib
+import functools
 import hashlib
+import http.client
 import json
+import multiprocessing
 import os
-import random
+import re
 import shutil
 import subprocess
 import sys
+import threading
 import time
+import urllib.parse
 import urllib.request
 import zipfile
-from os.path import join, split
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from os.path import join
 from pathlib import Path
 from shutil import which
 from subprocess import CalledProcessError
-from typing import Literal, TypeAlias, Union
-from urllib.error import HTTPError, URLError
+from typing import BinaryIO, Literal, TypeAlias
+
+try:
+    from orjson import loads as json_loads  # optional, parses the ~1 MB global manifest several times faster
+except ImportError:
+    from json import loads as json_loads
+
+if sys.platform.startswith('win'):
+    import msvcrt
+    import winreg
+else:
+    import fcntl
 
 if sys.version_info < (3, 7): raise OSError("Python verson must be 3.7 or above.")
 
@@ -26,6 +43,31 @@ MANIFEST_LOCATION = "https://piston-meta.mojang.com/mc/game/version_manifest_v2.
 CLIENT = "client"
 SERVER = "server"
 SideType: TypeAlias = Literal['client', 'server']
+MAX_REDIRECTS = 5
+USER_AGENT = "DecompilerMC"
+MANIFEST_TTL = 60 * 60  # seconds during which a downloaded manifest is trusted without asking Mojang again
+DOWNLOAD_PARTS = 4
+PARALLEL_DOWNLOAD_MIN_SIZE = 16 << 20  # below that one stream is as fast as several
+CHUNK_SIZE = 1 << 20  # 1 MiB per read when streaming, big enough for hashlib to release the GIL
+REMAP_PRIMITIVES = {"int": "I", "double": "D", "boolean": "Z", "float": "F", "long": "J", "byte": "B", "short": "S",
+                    "char": "C", "void": "V"}
+DOT_TO_SLASH = str.maketrans(".", "/")
+DECOMPILER_JVM_ARGS = ('-Xmx4G', '-Xms1G')
+KEPT_DIRECTORIES = frozenset(('net', 'assets', 'data', 'mojang', 'com', 'META-INF'))
+TRUE_STRINGS = frozenset(('yes', 'true', 't', 'y', '1'))
+FALSE_STRINGS = frozenset(('no', 'false', 'f', 'n', '0'))
+# answers accepted by the interactive prompts
+YES_ANSWERS = frozenset(('y', 'yes'))
+FERNFLOWER_ANSWERS = frozenset(('fernflower', 'f'))
+SERVER_ANSWERS = frozenset(('server', 's'))
+SNAPSHOT_ALIASES = frozenset(('snap', 's', 'snapshot'))
+LATEST_ALIASES = frozenset(('latest', 'l'))
+SKIP_JAVA_ENV = "DECOMPILERMC_SKIP_JAVA"
+DECOMPILED_MARKER = ".decompiled.json"  # records what a src/<version>/<side> folder was decompiled from
+# flags of the manual mode steps, in the order they run
+MANUAL_STEP_FLAGS = ('download_mapping', 'remap_mapping', 'download_jar', 'remap_jar', 'delete_dep', 'decompile')
+# `    [14:32:]<type> <name>[(<args>)][:14:32] -> <obf>`, a field or a method line of a proguard mapping
+MEMBER_LINE = re.compile(r"^    (?:\d+:\d+:)?(?P<type>\S+) (?P<name>[^ (]+)(?:\((?P<args>[^)]*)\))?(?::\d+)* -> (?P<obf>\S+)\s*$")
 PATH_TO_ROOT_DIR = Path(os.path.dirname(sys.argv[0]))
 
 
@@ -45,20 +87,44 @@ mc_path = get_minecraft_path()
 def str2bool(v: str | bool) -> bool:
     if isinstance(v, bool):
         return v
-    if v.lower() in ('yes', 'true', 't', 'y', '1'):
+    lowered = v.lower()
+    if lowered in TRUE_STRINGS:
         return True
-    elif v.lower() in ('no', 'false', 'f', 'n', '0'):
+    elif lowered in FALSE_STRINGS:
         return False
     raise argparse.ArgumentTypeError(f'Could not convert {v} to a Boolean value.')
 
 
-def check_java() -> None:
-    """Check for Java and setup the proper directory if needed."""
+@functools.lru_cache(maxsize=1)
+def check_java() -> str:
+    """Check for Java and return the java executable to run, it is looked up once per run.
+
+    The executable found is remembered in lib/java_path.txt and reused by later runs as long as it is not modified.
+    With DECOMPILERMC_SKIP_JAVA set (or --skip-java-check), the java of the PATH is used without checking it."""
+    if os.environ.get(SKIP_JAVA_ENV):
+        return 'java'
+    cache = (PATH_TO_ROOT_DIR / "lib" / "java_path.txt")
+    try:
+        java, mtime_ns = cache.read_text().splitlines()
+        if os.stat(java).st_mtime_ns == int(mtime_ns):
+            return java
+    except (OSError, ValueError):  # no cache yet, or java was removed or updated since
+        pass
+    java = find_java()
+    java_path = java if os.path.dirname(java) else which(java)
+    if java_path is not None:
+        try:
+            cache.parent.mkdir(parents=True, exist_ok=True)
+            cache.write_text(f"{java_path}\n{os.stat(java_path).st_mtime_ns}\n")
+        except OSError:
+            pass
+    return java
+
+
+def find_java() -> str:
     results = []
     if sys.platform.startswith('win'):
         if not results:
-            import winreg
-
             for flag in [winreg.KEY_WOW64_64KEY, winreg.KEY_WOW64_32KEY]:
                 try:
                     k = winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, r'Software\JavaSoft\Java Development Kit', 0,
@@ -70,80 +136,260 @@ def check_java() -> None:
                                        winreg.KEY_READ | flag)
                     path, _ = winreg.QueryValueEx(k, 'JavaHome')
                     k.Close()
-                    path = join(str(path), 'bin')
-                    subprocess.run(['"%s"' % join(path, 'java'), ' -version'], stdout=open(os.devnull, 'w'),
-                                   stderr=subprocess.STDOUT, check=True)
+                    # the real file name, java.exe, so that check_java can stat it for its cache
+                    path = which('java', path=join(str(path), 'bin')) or join(str(path), 'bin', 'java.exe')
+                    subprocess.run([path, '-version'], stdout=subprocess.DEVNULL,
+                                   stderr=subprocess.DEVNULL, check=True)
                     results.append(path)
+                    break
                 except (CalledProcessError, OSError):
                     pass
         if not results:
             try:
-                subprocess.run(['java', '-version'], stdout=open(os.devnull, 'w'), stderr=subprocess.STDOUT, check=True)
-                results.append('')
+                subprocess.run(['java', '-version'], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+                results.append('java')
             except (CalledProcessError, OSError):
                 pass
-        if not results and 'ProgramW6432' in os.environ:
-            results.append(which('java.exe', path=os.environ['ProgramW6432']))
-        if not results and 'ProgramFiles' in os.environ:
-            results.append(which('java.exe', path=os.environ['ProgramFiles']))
-        if not results and 'ProgramFiles(x86)' in os.environ:
-            results.append(which('java.exe', path=os.environ['ProgramFiles(x86)']))
+        for env in ('ProgramW6432', 'ProgramFiles', 'ProgramFiles(x86)'):
+            java = which('java.exe', path=os.environ[env]) if not results and env in os.environ else None
+            if java is not None:
+                results.append(java)
     elif sys.platform.startswith('linux') or sys.platform.startswith('darwin'):
         if not results:
             try:
-                subprocess.run(['java', '-version'], stdout=open(os.devnull, 'w'), stderr=subprocess.STDOUT, check=True)
-                results.append('')
+                subprocess.run(['java', '-version'], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+                results.append(which('java') or 'java')  # subprocess only uses posix_spawn for a full path
             except (CalledProcessError, OSError):
                 pass
-        if not results:
-            results.append(which('java', path='/usr/bin'))
-        if not results:
-            results.append(which('java', path='/usr/local/bin'))
-        if not results:
-            results.append(which('java', path='/opt'))
-    results = [path for path in results if path is not None]
+        for directory in ('/usr/bin', '/usr/local/bin', '/opt'):
+            java = which('java', path=directory) if not results else None
+            if java is not None:
+                results.append(java)
     if not results:
         raise RuntimeError(
             'Java JDK is not installed! Please install a Java JDK from https://java.oracle.com, or install OpenJDK.')
+    return results[0]
 
 
 def get_global_manifest(quiet) -> None:
     versionManifsetPath = (PATH_TO_ROOT_DIR / "versions" / "version_manifest.json")
-    if versionManifsetPath.is_file():
+    versionManifsetPath.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        age = time.time() - versionManifsetPath.stat().st_mtime
+    except FileNotFoundError:
+        age = MANIFEST_TTL
+    if age < MANIFEST_TTL:
         if not quiet:
             print(
-                f"Manifest already exists; not downloading again. If another manifest is wanted, please delete manually before running the program (location: {versionManifsetPath}).")
+                f"Manifest was checked less than {MANIFEST_TTL // 60} minutes ago; not downloading again. If another manifest is wanted, please delete manually before running the program (location: {versionManifsetPath}).")
         return
-    download_file(MANIFEST_LOCATION, versionManifsetPath, quiet)
-
-
-def download_file(url, filename: Path, quiet) -> None:
+    # older copies are only downloaded again when Mojang has changed them
+    try:
+        download_file(MANIFEST_LOCATION, versionManifsetPath, quiet, revalidate=True)
+    except RuntimeError as e:
+        if not versionManifsetPath.is_file():
+            raise
+        # offline, the manifest we have still lists every version it listed before
+        if not quiet:
+            print(f"Warning: could not check whether the manifest changed ({e}), using the one downloaded before.")
+
+
+class _Downloader(threading.local):
+    """Keep one connection per host and per thread alive so consecutive downloads share a TLS handshake."""
+
+    def __init__(self) -> None:
+        self.connections: dict[tuple[str, str], http.client.HTTPConnection] = {}
+
+    def fetch(self, url: str, headers: dict[str, str] | None = None, method: str = "GET") -> http.client.HTTPResponse:
+        for _ in range(MAX_REDIRECTS):
+            response = self._request(method, url, headers or {})
+            if response.status not in (301, 302, 303, 307, 308):
+                return response
+            response.read()  # drain the body so the connection can be reused
+            url = urllib.parse.urljoin(url, response.getheader("Location"))
+        raise RuntimeError(f'HTTP Error: too many redirects for {url}')
+
+    def close(self) -> None:
+        """Close the connections of this thread."""
+        for conn in self.connections.values():
+            conn.close()
+        self.connections.clear()
+
+    @staticmethod
+    def _proxy(parts: urllib.parse.SplitResult) -> urllib.parse.SplitResult | None:
+        """The proxy urllib would use for this url, from the *_proxy variables or the system settings."""
+        proxy = urllib.request.getproxies().get(parts.scheme)
+        if not proxy or urllib.request.proxy_bypass(parts.hostname or ""):
+            return None
+        return urllib.parse.urlsplit(proxy if "://" in proxy else f"http://{proxy}")
+
+    @staticmethod
+    def _connect(parts: urllib.parse.SplitResult, proxy: urllib.parse.SplitResult | None) -> http.client.HTTPConnection:
+        if proxy is None:
+            if parts.scheme == "https":
+                return http.client.HTTPSConnection(parts.netloc, timeout=60)
+            return http.client.HTTPConnection(parts.netloc, timeout=60)
+        if parts.scheme == "https":
+            # TLS goes through a CONNECT tunnel to the real host, the proxy itself is spoken to in plain http
+            conn = http.client.HTTPSConnection(proxy.hostname, proxy.port or 8080, timeout=60)
+            conn.set_tunnel(parts.hostname, parts.port, headers=_Downloader._proxy_authorization(proxy))
+            return conn
+        return http.client.HTTPConnection(proxy.hostname, proxy.port or 8080, timeout=60)
+
+    @staticmethod
+    def _proxy_authorization(proxy: urllib.parse.SplitResult) -> dict[str, str]:
+        if not proxy.username:
+            return {}
+        credentials = f"{urllib.parse.unquote(proxy.username)}:{urllib.parse.unquote(proxy.password or '')}"
+        return {"Proxy-Authorization": f"Basic {base64.b64encode(credentials.encode()).decode()}"}
+
+    def _request(self, method: str, url: str, headers: dict[str, str]) -> http.client.HTTPResponse:
+        parts = urllib.parse.urlsplit(url)
+        if parts.scheme not in ("http", "https"):
+            raise RuntimeError(f'URL Error: unsupported scheme in {url}')
+        target = parts.path or "/"
+        if parts.query:
+            target += f"?{parts.query}"
+        key = (parts.scheme, parts.netloc)
+        proxy = self._proxy(parts)
+        if proxy is not None and parts.scheme == "http":
+            target = url  # a plain http proxy is asked for the whole url
+            headers = {**self._proxy_authorization(proxy), **headers}
+        retried = False
+        while True:
+            conn = self.connections.get(key)
+            if conn is None:
+                conn = self._connect(parts, proxy)
+                self.connections[key] = conn
+            try:
+                conn.request(method, target, headers={"Connection": "keep-alive", "User-Agent": USER_AGENT, **headers})
+                return conn.getresponse()
+            except (http.client.HTTPException, OSError):
+                # the server may have closed an idle kept-alive connection, reconnect once
+                conn.close()
+                del self.connections[key]
+                if retried:
+                    raise
+                retried = True
+
+
+_downloader = _Downloader()
+
+
+def _download_range(url, filename: Path, start: int, end: int) -> None:
+    response = _downloader.fetch(url, {"Range": f"bytes={start}-{end}"})
+    if response.status != 206:
+        response.read()
+        raise RuntimeError(f'HTTP Error {response.status}: {response.reason} ({url}, bytes {start}-{end})')
+    with open(filename, 'r+b') as local_file:
+        local_file.seek(start)
+        shutil.copyfileobj(response, local_file, CHUNK_SIZE)
+        written = local_file.tell() - start
+    if written != end - start + 1:
+        raise RuntimeError(f'URL Error: the download of {url} stopped after {written} bytes of bytes {start}-{end}')
+
+
+def download_ranges(url, filename: Path) -> bool:
+    """Download url as DOWNLOAD_PARTS byte ranges at the same time, each over its own connection.
+
+    Returns False without writing anything when the server does not serve ranges."""
+    response = _downloader.fetch(url, method="HEAD")
+    response.read()
+    length = response.getheader("Content-Length")
+    if response.status != 200 or response.getheader("Accept-Ranges") != "bytes" or not length:
+        return False
+    size = int(length)
+    part_size = -(-size // DOWNLOAD_PARTS)
+    try:
+        with open(filename, 'wb') as local_file:
+            local_file.truncate(size)  # every part writes at its own offset
+        with ThreadPoolExecutor(max_workers=DOWNLOAD_PARTS) as executor:
+            parts = [executor.submit(_download_range, url, filename, start, min(start + part_size, size) - 1)
+                     for start in range(0, size, part_size)]
+            for part in parts:
+                part.result()
+    except BaseException:
+        filename.unlink(missing_ok=True)  # a file with holes would pass for a finished download
+        raise
+    return True
+
+
+def download_file(url, filename: Path, quiet, sha1: str | None = None, revalidate: bool = False,
+                  size: int | None = None) -> None:
+    """Download url to filename.
+
+    With revalidate, the ETag of the response is kept next to the file and sent back on the next download, the file
+    on disk is kept as is when the server answers that it did not change.
+    When the expected size is known and big enough, the file is downloaded in parallel ranges if the server allows it."""
+    etag_path = filename.with_name(f"{filename.name}.etag")
+    # the download only gets its real name once it is complete and checked, a failed or interrupted one could
+    # otherwise be picked up by the is_file checks of the next run
+    part_path = filename.with_name(f"{filename.name}.part")
+    headers = {}
+    if revalidate and filename.is_file() and etag_path.is_file():
+        headers["If-None-Match"] = etag_path.read_text()
     try:
         if not quiet:
             print(f'Downloading {filename}...')
-        f = urllib.request.urlopen(url)
-        with open(filename, 'wb+') as local_file:
-            local_file.write(f.read())
-    except HTTPError as e:
+        etag = None
+        if size is not None and size >= PARALLEL_DOWNLOAD_MIN_SIZE and download_ranges(url, part_path):
+            if sha1 is not None:
+                with open(part_path, 'rb') as local_file:
+                    file_hash = hash_file(local_file, "sha1")
+        else:
+            response = _downloader.fetch(url, headers)
+            if response.status == 304:
+                response.read()
+                os.utime(filename)  # the copy on disk was just confirmed current
+                if not quiet:
+                    print(f'{filename} did not change since the last download.')
+                return
+            if response.status != 200:
+                response.read()
+                raise RuntimeError(f'HTTP Error {response.status}: {response.reason} ({url})')
+            with open(part_path, 'wb+') as local_file:
+                if sha1 is None:
+                    shutil.copyfileobj(response, local_file, CHUNK_SIZE)
+                else:
+                    file_hash = copy_and_hash(response, local_file, "sha1")
+                written = local_file.tell()
+            # a connection closed early just ends the body, without a hash only the length tells it apart
+            length = response.getheader("Content-Length")
+            if length is not None and written != int(length):
+                raise RuntimeError(f'URL Error: the download of {url} stopped after {written} of {length} bytes')
+            etag = response.getheader("ETag")
+        if sha1 is not None and file_hash != sha1:
+            raise RuntimeError(
+                f"Downloaded file's hash ({file_hash}) and expected hash ({sha1}) did not match for {url}.")
+        os.replace(part_path, filename)
+        if revalidate:
+            if etag:
+                etag_path.write_text(etag)
+            else:
+                etag_path.unlink(missing_ok=True)  # it was the one of the previous copy
+    except http.client.HTTPException as e:
         raise RuntimeError(f'HTTP Error: {e}')
-    except URLError as e:
+    except OSError as e:
         raise RuntimeError(f'URL Error: {e}')
+    finally:
+        part_path.unlink(missing_ok=True)  # only still there when the download failed
+
 
+def read_json(path: Path) -> dict:
+    return json_loads(path.read_bytes())
 
+
+@functools.lru_cache(maxsize=1)
 def get_latest_version() -> tuple[str, str]:
-    path_to_json = (PATH_TO_ROOT_DIR / 'manifest.json')
-    download_file(MANIFEST_LOCATION, path_to_json, True)
+    get_global_manifest(True)
+    path_to_json = (PATH_TO_ROOT_DIR / "versions" / "version_manifest.json")
     snapshot = None
     release = None
-    if path_to_json.is_file():
-        path_to_json = path_to_json.resolve()
-        with open(path_to_json) as f:
-            versions = json.load(f)["latest"]
-            if versions and versions.get("release"):
-                release: str = versions.get("release")
-            if versions and versions.get("snapshot"):
-                snapshot: str = versions.get("snapshot")
-    path_to_json.unlink()
+    versions = _load_json(path_to_json)["latest"]  # get_global_manifest raised if the file could not be downloaded
+    if versions and versions.get("release"):
+        release: str = versions.get("release")
+    if versions and versions.get("snapshot"):
+        snapshot: str = versions.get("snapshot")
     if release is None:
         raise RuntimeError("Could not get latest release. Please refresh cache.")
     if snapshot is None:
@@ -151,6 +397,40 @@ def get_latest_version() -> tuple[str, str]:
     return snapshot, release
 
 
+def _load_json(path_to_json: Path) -> dict:
+    """Parse a manifest once and share it between the steps, until the file on disk is deleted or downloaded again."""
+    return _parse_json(path_to_json, _manifest_mtime_ns(path_to_json))
+
+
+def _manifest_mtime_ns(path_to_json: Path) -> int:
+    try:
+        return path_to_json.stat().st_mtime_ns
+    except FileNotFoundError:
+        raise RuntimeError(f'Missing manifest file: {path_to_json}') from None
+
+
+@functools.lru_cache(maxsize=8)
+def _parse_json(path_to_json: Path, mtime_ns: int) -> dict:
+    return read_json(path_to_json)
+
+
+def _load_version_manifest() -> dict[str, dict]:
+    """Index the versions of the global manifest by id, the index is built once per download of the manifest."""
+    path_to_json = (PATH_TO_ROOT_DIR / "versions" / "version_manifest.json")
+    return _index_version_manifest(path_to_json, _manifest_mtime_ns(path_to_json))
+
+
+@functools.lru_cache(maxsize=1)
+def _index_version_manifest(path_to_json: Path, mtime_ns: int) -> dict[str, dict]:
+    manifest = _parse_json(path_to_json, mtime_ns)
+    return {version["id"]: version for version in manifest["versions"] if version.get("id")}
+
+
+def _load_version_json(version: str) -> dict:
+    """versions/<version>/version.json, it is shared by the jar and the mappings steps."""
+    return _load_json(PATH_TO_ROOT_DIR / "versions" / version / "version.json")
+
+
 def get_version_manifest(target_version: str, quiet) -> None:
     version_path = (PATH_TO_ROOT_DIR / "versions" / target_version / "version.json")
     if version_path.is_file():
@@ -158,82 +438,111 @@ def get_version_manifest(target_version: str, quiet) -> None:
             print(
                 f"Version manifest already exists; not downloading again. If another version manifest is wanted, please delete manually before running the program (location: {version_path}).")
         return
-    path_to_json = (PATH_TO_ROOT_DIR / "versions" / "version_manifest.json")
-    if not path_to_json.exists() or not path_to_json.is_file(): raise RuntimeError(
-        f'Missing manifest file: {path_to_json}')
-    path_to_json = path_to_json.resolve()
-    with open(path_to_json) as f:
-        versions = json.load(f)["versions"]
-        for version in versions:
-            if version.get("id") and version.get("id") == target_version and version.get("url"):
-                download_file(version.get("url"), version_path, quiet)
-                break
-
-
-def sha256(fname: Union[Union[str, bytes], int]) -> str:
-    hash_sha256 = hashlib.sha256()
-    with open(fname, "rb") as f:
-        for chunk in iter(lambda: f.read(4096), b""):
-            hash_sha256.update(chunk)
-    return hash_sha256.hexdigest()
+    get_global_manifest(quiet)  # only needed to find version.json, runs of a version already on disk work offline
+    version = _load_version_manifest().get(target_version)
+    if not version or not version.get("url"):
+        raise RuntimeError(f'Version {target_version} is not listed in the manifest, check that it exists.')
+    download_file(version.get("url"), version_path, quiet, version.get("sha1"))
+
+
+def advise_sequential(file: BinaryIO) -> None:
+    """Tell the kernel a file is about to be read from start to end so it reads ahead further, only on posix."""
+    if hasattr(os, "posix_fadvise"):
+        try:
+            os.posix_fadvise(file.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        except OSError:
+            pass
+
+
+def drop_from_cache(path: str | Path) -> None:
+    """Tell the kernel a file will not be read again soon, so its pages leave room for the next steps, only on posix."""
+    if hasattr(os, "posix_fadvise"):
+        try:
+            with open(path, 'rb') as file:
+                os.posix_fadvise(file.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+        except OSError:
+            pass
+
+
+def hash_file(src: BinaryIO, algorithm: str) -> str:
+    advise_sequential(src)
+    if hasattr(hashlib, "file_digest"):  # python 3.11+
+        return hashlib.file_digest(src, algorithm).hexdigest()
+    digest = hashlib.new(algorithm)
+    buffer = bytearray(CHUNK_SIZE)  # reused for every read instead of new bytes per chunk
+    view = memoryview(buffer)
+    while size := src.readinto(buffer):
+        digest.update(view[:size])
+    return digest.hexdigest()
+
+
+def copy_and_hash(src: BinaryIO, dst: BinaryIO, algorithm: str) -> str:
+    """Copy src into dst and return the hex digest of the copied bytes, hashing them on the way through."""
+    digest = hashlib.new(algorithm)
+    for chunk in iter(lambda: src.read(CHUNK_SIZE), b""):
+        digest.update(chunk)
+        dst.write(chunk)
+    return digest.hexdigest()
+
+
+def extract_server_jar(target_side_path: Path, target_version: str, quiet) -> None:
+    """Replace a server bundler (21w39a and newer) by the server jar it contains, other jars are left as they are."""
+    extracted_path = target_side_path.with_name(f"{SERVER}-extracted.jar")
+    version_hash = None
+    with zipfile.ZipFile(target_side_path, mode="r") as z:
+        try:
+            content = z.read("META-INF/versions.list").strip()
+        except KeyError:
+            # we don't have a versions.list in it
+            content = None
+        if content is not None:
+            element = content.split(b"\t")
+            if len(element) != 3:
+                raise RuntimeError(
+                    f"Jar should be extracted but version list is not in the correct format, expected 3 fields, got {len(element)} for {content}")
+            version_hash = element[0].decode()
+            version = element[1].decode()
+            path = element[2].decode()
+            if version != target_version and not quiet:
+                print(
+                    f"Warning: received version ({version}) does not match the targeted version ({target_version}).")
+            # stream the inner jar straight to its destination, no META-INF tree is created
+            try:
+                with z.open(f"META-INF/versions/{path}") as src, open(extracted_path, 'wb') as dst:
+                    file_hash = copy_and_hash(src, dst, "sha256")
+            except (KeyError, OSError) as e:
+                raise RuntimeError(f"Could not extract to {extracted_path}: {e}")
+    if version_hash is not None:
+        if file_hash != version_hash:
+            extracted_path.unlink()
+            raise RuntimeError(
+                f"Extracted file's hash ({file_hash}) and expected hash ({version_hash}) did not match.")
+        # swap it in only once the outer archive is closed
+        os.replace(extracted_path, target_side_path)
 
 
 def get_version_jar(target_version: str, side: SideType, quiet) -> None:
-    path_to_json = (PATH_TO_ROOT_DIR / "versions" / target_version / "version.json")
     target_side_path = (PATH_TO_ROOT_DIR / "versions" / target_version / f"{side}.jar")
     if target_side_path.is_file():
         if not quiet:
             print(
                 f"Version jar already exists; not downloading again. If another version jar is wanted, please delete manually before running the program (location: {target_side_path}).")
-        return
-    if not path_to_json.exists() or not path_to_json.is_file(): raise RuntimeError(
-        f'Missing manifest file: {path_to_json}')
-    path_to_json = path_to_json.resolve()
-    with open(path_to_json) as f:
-        jsn = json.load(f)
-        if not jsn.get("downloads") or not jsn.get("downloads").get(side) or not jsn.get("downloads").get(side).get(
-            "url"):
-            raise RuntimeError("Could not download jar, missing fields")
-        download_file(jsn.get("downloads").get(side).get("url"), target_side_path, quiet)
-        # In case the server is newer than 21w39a you need to actually extract it first from the archive
         if side == SERVER:
-            if not target_side_path.exists():
-                raise RuntimeError(
-                    f"Jar was maybe downloaded but not located, this is a failure, check path at {target_side_path}")
-            with zipfile.ZipFile(target_side_path, mode="r") as z:
-                content = None
-                try:
-                    content = z.read(Path(f"META-INF", "versions.list"))
-                except Exception as _:
-                    # we don't have a versions.list in it
-                    pass
-                if content is not None:
-                    element = content.split(b"\t")
-                    if len(element) != 3:
-                        raise RuntimeError(
-                            f"Jar should be extracted but version list is not in the correct format, expected 3 fields, got {len(element)} for {content}")
-                    version_hash = element[0].decode()
-                    version = element[1].decode()
-                    path = element[2].decode()
-                    if version != target_version and not quiet:
-                        print(
-                            f"Warning: received version ({version}) does not match the targeted version ({target_version}).")
-                    new_jar_path = (PATH_TO_ROOT_DIR / "versions" / target_version)
-                    try:
-                        new_jar_path = z.extract(Path("META-INF", "versions", path), new_jar_path)
-                    except Exception as e:
-                        raise RuntimeError(f"Could not extract to {new_jar_path}: {e}")
-                    if not (PATH_TO_ROOT_DIR / new_jar_path).exists():
-                        raise RuntimeError(f"New {side} jar could not be extracted from archive at {new_jar_path}.")
-                    file_hash = sha256(new_jar_path)
-                    if file_hash != version_hash:
-                        raise RuntimeError(
-                            f"Extracted file's hash ({file_hash}) and expected hash ({version_hash}) did not match.")
-                    try:
-                        shutil.move((PATH_TO_ROOT_DIR / new_jar_path), target_side_path)
-                        shutil.rmtree((PATH_TO_ROOT_DIR / "versions" / target_version / "META-INF"))
-                    except Exception as e:
-                        raise RuntimeError("Exception while removing the temp file", e)
+            # a run stopped between the download and the extraction left the bundler in place of the server jar
+            extract_server_jar(target_side_path, target_version, quiet)
+        return
+    jsn = _load_version_json(target_version)
+    if not jsn.get("downloads") or not jsn.get("downloads").get(side) or not jsn.get("downloads").get(side).get(
+        "url"):
+        raise RuntimeError("Could not download jar, missing fields")
+    download_file(jsn.get("downloads").get(side).get("url"), target_side_path, quiet,
+                  jsn.get("downloads").get(side).get("sha1"), size=jsn.get("downloads").get(side).get("size"))
+    # In case the server is newer than 21w39a you need to actually extract it first from the archive
+    if side == SERVER:
+        if not target_side_path.exists():
+            raise RuntimeError(
+                f"Jar was maybe downloaded but not located, this is a failure, check path at {target_side_path}")
+        extract_server_jar(target_side_path, target_version, quiet)
     if not quiet:
         print("Done !")
 
@@ -245,41 +554,111 @@ def get_mappings(version: str, side: SideType, quiet) -> None:
             print(
                 f"Mappings already exist; not downloading again. If other mappings are wanted, please delete manually before running the program (location: {versionSidePath}).")
         return
-    path_to_json = (PATH_TO_ROOT_DIR / "versions" / version / "version.json")
-    if not path_to_json.exists() or not path_to_json.is_file():
-        raise RuntimeError(f'Missing manifest file: {path_to_json}')
+    jfile = _load_version_json(version)
+    if side not in (CLIENT, SERVER):
+        raise RuntimeError('Type not recognized.')
+    url = jfile['downloads'].get(f'{side}_mappings')  # client_mappings or server_mappings
+    if not url or 'url' not in url:
+        # TODO: Clean up failed run before raising
+        raise RuntimeError(f'Could not find {side} mappings for {version}')
     if not quiet:
-        print(f'Found {path_to_json}')
-    path_to_json = path_to_json.resolve()
-    with open(path_to_json) as f:
-        jfile = json.load(f)
-        url = jfile['downloads']
-        if side == CLIENT:  # client:
-            if 'client_mappings' not in url or 'url' not in url['client_mappings']:
-                # TODO: Clean up failed run before raising
-                raise RuntimeError(f'Could not find client mappings for {version}')
-            url = url['client_mappings']['url']
-        elif side == SERVER:  # server
-            if 'server_mappings' not in url or 'url' not in url['server_mappings']:
-                # TODO: Clean up failed run before raising
-                raise RuntimeError(f'Could not find server mappings for {version}')
-            url = url['server_mappings']['url']
-        else:
-            raise RuntimeError('Type not recognized.')
-        if not quiet:
-            print(f'Downloading the mappings for {version}...')
-        download_file(url,
-                      (PATH_TO_ROOT_DIR / "mappings" / version / f"{'client' if side == CLIENT else 'server'}.txt"),
-                      quiet)
+        print(f'Downloading the mappings for {version}...')
+    download_file(url['url'], versionSidePath, quiet, url.get('sha1'))
+
+
+def require_file(path: Path) -> str:
+    """Return the absolute path of a file the pipeline needs, or raise if it is missing (a single stat call)."""
+    if not path.is_file():
+        raise RuntimeError(f'Missing file: {path}')
+    return os.path.abspath(path)
+
+
+def is_up_to_date(output: Path, *inputs: str) -> bool:
+    """Whether output exists and is at least as recent as all of its inputs, so the step making it can be skipped."""
+    try:
+        mtime = output.stat().st_mtime_ns
+    except FileNotFoundError:
+        return False
+    return all(os.stat(path).st_mtime_ns <= mtime for path in inputs)
 
 
-def remap(version: str, side: SideType, quiet) -> None:
+@functools.lru_cache(maxsize=1)
+def get_java_version() -> int:
+    """Major version of the java found by check_java, 0 if it cannot be determined."""
+    try:
+        result = subprocess.run([check_java(), '-version'], capture_output=True, text=True, check=True)
+    except (CalledProcessError, OSError, RuntimeError):  # RuntimeError: no java at all
+        return 0
+    match = re.search(r'version "(\d+)(?:\.(\d+))?', result.stderr)
+    if match is None:
+        return 0
+    major = int(match.group(1))
+    return int(match.group(2) or 0) if major == 1 else major  # 1.8 -> 8
+
+
+def java_executable() -> str:
+    """The file check_java runs, with the links resolved."""
+    java = check_java()
+    return os.path.realpath(java if os.path.dirname(java) else which(java) or java)
+
+
+def class_data_sharing_args(jar: str, record_archive: bool = True) -> tuple[tuple[str, ...], tuple[Path, Path] | None]:
+    """Map the classes of a previous run from a shared archive next to the jar, or record that archive on this run.
+
+    When recording, the JVM writes a file of its own, returned with the archive path for run_java to move it there:
+    parallel runs of different versions would otherwise write the same archive at the same time."""
+    java_version = get_java_version()
+    if java_version < 13:  # dynamic archives (-XX:ArchiveClassesAtExit) came with JDK 13
+        return (), None
+    # an archive only loads in the JVM that recorded it and for the jar path it was recorded with, so there is one
+    # per java and checkout, and it is recorded again once java was updated in place
+    java = java_executable()
+    key = hashlib.blake2b(f"{java}\0{os.path.abspath(jar)}".encode(), digest_size=4).hexdigest()
+    archive = Path(jar).with_suffix(f".jdk{java_version}-{key}.jsa")
+    try:
+        up_to_date = archive.stat().st_mtime >= os.stat(java).st_mtime
+    except OSError:
+        up_to_date = False
+    if up_to_date:
+        return (f'-XX:SharedArchiveFile={archive}',), None
+    if not record_archive:
+        return (), None
+    recording = archive.with_name(f"{archive.stem}.{unique_suffix()}.jsa")
+    return (f'-XX:ArchiveClassesAtExit={recording}',), (recording, archive)
+
+
+def run_java(jar: str, args: list, quiet, jvm_args: tuple[str, ...] = (), record_archive: bool = True) -> None:
+    """Run an executable jar, all the java tools of the pipeline go through here."""
+    # our descriptors are not inheritable anyway, and without close_fds subprocess can posix_spawn the JVM instead of
+    # forking this process
+    cds_args, recording = class_data_sharing_args(jar, record_archive)
+    try:
+        subprocess.run([check_java(), *jvm_args, *cds_args, '-jar', jar, *args],
+                       check=True, capture_output=quiet, close_fds=False)
+    except BaseException:
+        if recording is not None:
+            recording[0].unlink(missing_ok=True)
+        raise
+    if recording is not None and recording[0].is_file():
+        os.replace(*recording)  # whole archives only, the last run to finish wins
+
+
+def run_java_jobs(jar: str, jobs_args: list[list], quiet, jvm_args: tuple[str, ...] = ()) -> None:
+    """Run the same jar once per argument list, all the JVMs at the same time."""
+    with ThreadPoolExecutor(max_workers=len(jobs_args)) as executor:
+        # one JVM recording the class data sharing archive is enough, the others would only redo it
+        runs = [executor.submit(run_java, jar, args, quiet, jvm_args, index == 0) for index, args in enumerate(jobs_args)]
+        for run in runs:
+            run.result()
+
+
+def remap(version: str, side: SideType, quiet, force=False) -> None:
     if not quiet:
         print('=== Remapping jar using SpecialSource ====')
     t = time.time()
     path = (PATH_TO_ROOT_DIR / "versions" / version / f"{side}.jar")
     # that part will not be assured by arguments
-    if not path.exists() or not path.is_file():
+    if not path.is_file():
         path_temp = (mc_path / "versions" / version / f"{version}.jar").expanduser()
         if path_temp.is_file():
             # TODO: Automate choice if auto mode is enabled
@@ -288,204 +667,259 @@ def remap(version: str, side: SideType, quiet) -> None:
                 # TODO: Replace with something else
                 sys.exit(-1)
             path = path_temp
-    if not path.exists() or not path.is_file():
-        raise RuntimeError(f'Missing file: {path}')
-    path = path.resolve()
-
-    mapp = (PATH_TO_ROOT_DIR / "mappings" / version / f"{side}.tsrg")
-    if not mapp.exists() or not mapp.is_file():
-        raise RuntimeError(f'Missing file: {mapp}')
-    mapp = mapp.resolve()
-
-    special_source_path = (PATH_TO_ROOT_DIR / "lib" / f"SpecialSource-{SPECIAL_SOURCE_VERSION}.jar")
-    if not special_source_path.exists() or not special_source_path.is_file():
-        raise RuntimeError(f'Missing file: {special_source_path}')
-    special_source_path = special_source_path.resolve()
+    path = require_file(path)
+    mapp = require_file(PATH_TO_ROOT_DIR / "mappings" / version / f"{side}.tsrg")
+    special_source_path = require_file(PATH_TO_ROOT_DIR / "lib" / f"SpecialSource-{SPECIAL_SOURCE_VERSION}.jar")
     out_jar_path = (PATH_TO_ROOT_DIR / "src" / f"{version}-{side}-temp.jar")
-
-    subprocess.run(['java',
-                    '-jar', special_source_path.__str__(),
-                    '--in-jar', path.__str__(),
-                    '--out-jar', out_jar_path,
-                    '--srg-in', mapp.__str__(),
-                    "--kill-lvt"  # kill snowmen
-                    ], check=True, capture_output=quiet)
+    # left over by a run that stopped before decompiling, SpecialSource would produce the same jar again
+    if not force and is_up_to_date(out_jar_path, path, mapp):
+        if not quiet:
+            print(f'{out_jar_path} is newer than the jar and the mappings, not remapping again.')
+        return
+    remapping_jar_path = (PATH_TO_ROOT_DIR / "src" / f"{version}-{side}-remapping.jar")
+
+    run_java(special_source_path, ['--in-jar', path,
+                                   '--out-jar', remapping_jar_path,
+                                   '--srg-in', mapp,
+                                   "--kill-lvt"  # kill snowmen
+                                   ], quiet)
+    os.replace(remapping_jar_path, out_jar_path)  # only a complete jar gets the name the next steps look for
+    drop_from_cache(path)  # the decompiler only reads the remapped jar
     if not quiet:
         print(f'Created {out_jar_path}.')
         t = time.time() - t
         print('Done in %.1fs' % t)
 
 
-def decompile_fern_flower(decompiled_version: str, version: str, side: SideType, quiet, force) -> None:
+def decompile_fern_flower(decompiled_version: str, version: str, side: SideType, quiet, force, jobs: int = 1) -> None:
     if not quiet:
         print('=== Decompiling using FernFlower (silent) ===')
     t = time.time()
 
-    path = (PATH_TO_ROOT_DIR / "src" / f"{version}-{side}-temp.jar")
-    if not path.exists() or not path.is_file():
-        raise RuntimeError(f'Missing file: {path}')
-    path = path.resolve()
-
-    fernflower = (PATH_TO_ROOT_DIR / "lib" / "fernflower.jar")
-    if not fernflower.exists() or not fernflower.is_file():
-        raise RuntimeError(f'Missing file: {fernflower}')
-    fernflower = fernflower.resolve()
+    path = require_file(PATH_TO_ROOT_DIR / "src" / f"{version}-{side}-temp.jar")
+    fernflower = require_file(PATH_TO_ROOT_DIR / "lib" / "fernflower.jar")
 
     side_folder = (PATH_TO_ROOT_DIR / "src" / decompiled_version / side)
-    subprocess.run(['java',
-                    '-Xmx4G',
-                    '-Xms1G',
-                    '-jar', fernflower.__str__(),
-                    '-hes=0',  # hide empty super invocation deactivated (might clutter but allow following)
-                    '-hdc=0',  # hide empty default constructor deactivated (allow to track)
-                    '-dgs=1',  # decompile generic signatures activated (make sure we can follow types)
-                    '-lit=1',  # output numeric literals
-                    '-asc=1',  # encode non-ASCII characters in string and character
-                    '-log=WARN',
-                    path.__str__(), side_folder
-                    ], check=True, capture_output=quiet)
+    options = ['-hes=0',  # hide empty super invocation deactivated (might clutter but allow following)
+               '-hdc=0',  # hide empty default constructor deactivated (allow to track)
+               '-dgs=1',  # decompile generic signatures activated (make sure we can follow types)
+               '-lit=1',  # output numeric literals
+               '-asc=1',  # encode non-ASCII characters in string and character
+               '-log=WARN']
+    if jobs > 1:
+        shards = shard_jar(path, jobs)
+        # the whole jar is a library of every shard so the types of the other shards still resolve
+        run_java_jobs(fernflower, [[*options, f'-e={path}', shard, side_folder] for shard in shards], quiet,
+                      jvm_args=DECOMPILER_JVM_ARGS)
+        for shard in shards:
+            os.remove(shard)
+    else:
+        shards = [Path(path)]
+        run_java(fernflower, [*options, path, side_folder], quiet, jvm_args=DECOMPILER_JVM_ARGS)
     if not quiet:
         print(f'Removing {path}...')
     os.remove(path)
     if not quiet:
         print("Decompressing remapped jar to directory...")
-    with zipfile.ZipFile(side_folder / f"{version}-{side}-temp.jar") as z:
-        z.extractall(path=side_folder)
+    output_jars = [side_folder / shard.name for shard in shards]  # fernflower names its output after its input
+    for output_jar in output_jars:
+        extract_jar(output_jar, side_folder)
     t = time.time() - t
+    remove_jars = force
     if not quiet:
         print(f'Done in %.1fs (file was decompressed in {decompiled_version}/{side})' % t)
         # TODO: Automate choice if auto mode is enabled
         print('Remove Extra Jar file? (y/n): ')
         response = input() or "y"
-        if response == 'y':
-            print(f'Removing {side_folder / f"{version}-{side}-temp.jar"}...')
-            os.remove(side_folder / f"{version}-{side}-temp.jar")
-    if force:
-        os.remove(side_folder / f'{version}-{side}-temp.jar')
+        remove_jars = remove_jars or response == 'y'
+    if remove_jars:
+        for output_jar in output_jars:
+            if not quiet:
+                print(f'Removing {output_jar}...')
+            os.remove(output_jar)
 
 
-def decompile_cfr(decompiled_version: str, version: str, side: SideType, quiet) -> None:
+def decompile_cfr(decompiled_version: str, version: str, side: SideType, quiet, jobs: int = 1) -> None:
     if not quiet:
         print('=== Decompiling using CFR (silent) ===')
     t = time.time()
 
-    path = (PATH_TO_ROOT_DIR / "src" / f"{version}-{side}-temp.jar")
-    if not path.exists() or not path.is_file():
-        raise RuntimeError(f'Missing file: {path}')
-    path = path.resolve()
-
-    cfr = (PATH_TO_ROOT_DIR / "lib" / f"cfr-{CFR_VERSION}.jar")
-    if not cfr.exists() or not path.is_file():
-        raise RuntimeError(f'Missing file: {cfr}')
-    cfr = cfr.resolve()
+    path = require_file(PATH_TO_ROOT_DIR / "src" / f"{version}-{side}-temp.jar")
+    cfr = require_file(PATH_TO_ROOT_DIR / "lib" / f"cfr-{CFR_VERSION}.jar")
 
     side_folder = (PATH_TO_ROOT_DIR / "src" / decompiled_version / side)
-    subprocess.run(['java',
-                    '-Xmx4G',
-                    '-Xms1G',
-                    '-jar', cfr.__str__(),
-                    path.__str__(),
-                    '--outputdir', side_folder,
-                    '--caseinsensitivefs', 'true',
-                    "--silent", "true"
-                    ], check=True, capture_output=quiet)
+    options = ['--caseinsensitivefs', 'true',
+               "--silent", "true"]
+    if jobs > 1:
+        shards = shard_jar(path, jobs)
+        # one output folder per shard, every CFR run writes its own summary.txt
+        shard_folders = [side_folder.with_name(f"{side}-{index}") for index in range(len(shards))]
+        run_java_jobs(cfr, [[shard, '--extraclasspath', path, '--outputdir', shard_folder, *options]
+                            for shard, shard_folder in zip(shards, shard_folders)], quiet, jvm_args=DECOMPILER_JVM_ARGS)
+        for shard, shard_folder in zip(shards, shard_folders):
+            os.remove(shard)
+            os.remove(shard_folder / "summary.txt")
+            merge_tree(shard_folder, side_folder)
+    else:
+        run_java(cfr, [path, '--outputdir', side_folder, *options], quiet, jvm_args=DECOMPILER_JVM_ARGS)
+        if not quiet:
+            print(f'Removing {side_folder / "summary.txt"}...')
+        os.remove(side_folder / "summary.txt")
     if not quiet:
         print(f'Removing {path}...')
     os.remove(path)
-    if not quiet:
-        print(f'Removing {side_folder / "summary.txt"}...')
-    os.remove(side_folder / "summary.txt")
     if not quiet:
         t = time.time() - t
         print('Done in %.1fs' % t)
 
 
 def remove_brackets(line: str, counter: int) -> tuple[str, int]:
-    while '[]' in line:  # get rid of the array brackets while counting them
-        counter += 1
-        line = line[:-2]
-    return line, counter
+    stripped = line.rstrip('[]')  # get rid of the array brackets while counting them
+    return stripped, counter + (len(line) - len(stripped)) // 2
 
 
+@functools.lru_cache(maxsize=None)  # the same few thousand class names come back on every other line of the mappings
 def remap_file_path(path: str) -> str:
-    remap_primitives = {"int": "I", "double": "D", "boolean": "Z", "float": "F", "long": "J", "byte": "B", "short": "S",
-                        "char": "C", "void": "V"}
-    return "L" + "/".join(path.split(".")) + ";" if path not in remap_primitives else remap_primitives[path]
+    primitive = REMAP_PRIMITIVES.get(path)
+    return primitive if primitive is not None else "L" + path.translate(DOT_TO_SLASH) + ";"
+
+
+def remap_type(java_type: str, file_name: dict[str, str]) -> str:
+    """Descriptor of a type of the mappings, the classes get their obfuscated name."""
+    java_type, array_length = remove_brackets(java_type, 0)
+    java_type = remap_file_path(java_type)  # remap the dots to / and add the L ; or remap to a primitives character
+    obf_name = file_name.get(java_type)  # get the obfuscated name of the class
+    if obf_name is not None:
+        java_type = "L" + obf_name + ";"
+    if "." in java_type:  # if the class is already packaged then change the name that the obfuscated gave
+        java_type = java_type.translate(DOT_TO_SLASH)
+    return "[" * array_length + java_type  # restore the array brackets upfront
 
 
 def convert_mappings(version: str, side: SideType, quiet) -> None:
     version_side_path = (PATH_TO_ROOT_DIR / "mappings" / version / f"{side}.txt")
-    with open(version_side_path, 'r') as inputFile:
-        file_name: dict[str, str] = {}
-        for line in inputFile.readlines():
-            if line.startswith('#'):  # comment at the top, could be stripped
-                continue
-            deobf_name, obf_name = line.split(' -> ')
-            if not line.startswith('    '):
-                obf_name = obf_name.split(":")[0]
-                file_name[remap_file_path(deobf_name)] = obf_name  # save it to compare to put the Lb
-
-    with open(version_side_path, 'r') as inputFile, open(PATH_TO_ROOT_DIR / "mappings" / version / f"{side}.tsrg",
-                                                         'w+') as outputFile:
-        for line in inputFile.readlines():
-            if line.startswith('#'):  # comment at the top, could be stripped
-                continue
+    tsrg_path = (PATH_TO_ROOT_DIR / "mappings" / version / f"{side}.tsrg")
+    digest_path = (PATH_TO_ROOT_DIR / "mappings" / version / f"{side}.tsrg.blake2b")
+    with open(version_side_path, 'rb') as mappings_file:
+        advise_sequential(mappings_file)
+        mappings = mappings_file.read()
+    digest = hashlib.blake2b(mappings).hexdigest()
+    # the tsrg only depends on the proguard file, a previous run already converted these exact bytes
+    try:
+        up_to_date = digest_path.read_text() == digest and tsrg_path.is_file()
+    except FileNotFoundError:
+        up_to_date = False
+    if up_to_date:
+        if not quiet:
+            print(f"{tsrg_path} is up to date with {version_side_path}, not converting again.")
+        return
+    digest_path.unlink(missing_ok=True)  # a conversion stopped halfway must not pass for up to date
+    # read the file once, comments at the top could be stripped
+    lines = [line for line in mappings.decode().splitlines() if not line.startswith('#')]
+    file_name: dict[str, str] = {}
+    for line in lines:
+        if not line.startswith('    '):
             deobf_name, obf_name = line.split(' -> ')
-            if line.startswith('    '):
-                obf_name = obf_name.rstrip()  # remove leftover right spaces
-                deobf_name = deobf_name.lstrip()  # remove leftover left spaces
-                method_type, method_name = deobf_name.split(" ")  # split the `<methodType> <methodName>`
-                method_type = method_type.split(":")[
-                    -1]  # get rid of the line numbers at the beginning for functions eg: `14:32:void`-> `void`
-                if "(" in method_name and ")" in method_name:  # detect a function function
-                    variables = method_name.split('(')[-1].split(')')[0]  # get rid of the function name and parenthesis
-                    function_name = method_name.split('(')[0]  # get the function name only
-                    array_length_type = 0
-
-                    method_type, array_length_type = remove_brackets(method_type, array_length_type)
-                    method_type = remap_file_path(
-                        method_type)  # remap the dots to / and add the L ; or remap to a primitives character
-                    method_type = "L" + file_name[
-                        method_type] + ";" if method_type in file_name else method_type  # get the obfuscated name of the class
-                    if "." in method_type:  # if the class is already packaged then change the name that the obfuscated gave
-                        method_type = "/".join(method_type.split("."))
-                    for i in range(array_length_type):  # restore the array brackets upfront
-                        if method_type[-1] == ";":
-                            method_type = "[" + method_type[:-1] + ";"
-                        else:
-                            method_type = "[" + method_type
-
-                    if variables != "":  # if there is variables
-                        array_length_variables = [0] * len(variables)
-                        variables = list(variables.split(","))  # split the variables
-                        for i in range(len(variables)):  # remove the array brackets for each variable
-                            variables[i], array_length_variables[i] = remove_brackets(variables[i],
-                                                                                      array_length_variables[i])
-                        variables = [remap_file_path(variable) for variable in
-                                     variables]  # remap the dots to / and add the L ; or remap to a primitives character
-                        variables = ["L" + file_name[variable] + ";" if variable in file_name else variable for variable
-                                     in variables]  # get the obfuscated name of the class
-                        variables = ["/".join(variable.split(".")) if "." in variable else variable for variable in
-                                     variables]  # if the class is already packaged then change the obfuscated name
-                        for i in range(len(variables)):  # restore the array brackets upfront for each variable
-                            for _ in range(array_length_variables[i]):
-                                if variables[i][-1] == ";":
-                                    variables[i] = "[" + variables[i][:-1] + ";"
-                                else:
-                                    variables[i] = "[" + variables[i]
-                        variables = "".join(variables)
-
-                    outputFile.write(f'\t{obf_name} ({variables}){method_type} {function_name}\n')
-                else:
-                    outputFile.write(f'\t{obf_name} {method_name}\n')
-
+            obf_name = obf_name.split(":")[0]
+            file_name[remap_file_path(deobf_name)] = obf_name  # save it to compare to put the Lb
+
+    # the same argument and return types come back all over the file, each one is converted once
+    descriptors: dict[str, str] = {}
+
+    def descriptor(java_type: str) -> str:
+        converted = descriptors.get(java_type)
+        if converted is None:
+            converted = descriptors[java_type] = remap_type(java_type, file_name)
+        return converted
+
+    output: list[str] = []  # written in one go at the end instead of one write per line
+    for line in lines:
+        if line.startswith('    '):
+            member = MEMBER_LINE.match(line)
+            if member is None:
+                raise RuntimeError(f'Could not parse mapping line: {line}')
+            # line numbers eg: `14:32:void` -> `void` are dropped by the pattern
+            method_type, method_name, variables, obf_name = member.group("type", "name", "args", "obf")
+            if variables is not None:  # detect a function
+                method_type = descriptor(method_type)
+                if variables != "":  # if there is variables
+                    variables = "".join([descriptor(variable) for variable in variables.split(",")])
+                output.append(f'\t{obf_name} ({variables}){method_type} {method_name}\n')
             else:
-                obf_name = obf_name.split(":")[0]
-                outputFile.write(remap_file_path(obf_name)[1:-1] + " " + remap_file_path(deobf_name)[1:-1] + "\n")
+                output.append(f'\t{obf_name} {method_name}\n')
+
+        else:
+            deobf_name, obf_name = line.split(' -> ')
+            obf_name = obf_name.split(":")[0]
+            output.append(remap_file_path(obf_name)[1:-1] + " " + remap_file_path(deobf_name)[1:-1] + "\n")
+    with open(tsrg_path, 'w+') as outputFile:
+        outputFile.write("".join(output))
+    digest_path.write_text(digest)
     if not quiet:
         print("Done !")
 
 
+def decompilation_inputs(version: str, side: SideType, decompiler: str) -> dict | None:
+    """What a decompilation of version and side is made from, None while version.json is not downloaded yet."""
+    if not (PATH_TO_ROOT_DIR / "versions" / version / "version.json").is_file():
+        return None
+    downloads = _load_version_json(version).get("downloads", {})
+    return {"version": version, "side": side, "decompiler": decompiler,
+            "jar": downloads.get(side, {}).get("sha1"), "mappings": downloads.get(f"{side}_mappings", {}).get("sha1")}
+
+
+def is_decompiled(version: str, side: SideType, decompiler: str) -> bool:
+    """Whether src/<version>/<side> already holds a complete decompilation of the same inputs."""
+    marker = (PATH_TO_ROOT_DIR / "src" / version / side / DECOMPILED_MARKER)
+    inputs = decompilation_inputs(version, side, decompiler)
+    if inputs is None:
+        return False
+    try:
+        return read_json(marker) == inputs
+    except (FileNotFoundError, ValueError):  # a marker that cannot be parsed is decompiled again
+        return False
+
+
+def mark_decompiled(decompiled_version: str, version: str, side: SideType, decompiler: str) -> None:
+    """Record what src/<decompiled_version>/<side> was decompiled from, for is_decompiled."""
+    marker = (PATH_TO_ROOT_DIR / "src" / decompiled_version / side / DECOMPILED_MARKER)
+    temp_marker = marker.with_name(f"{DECOMPILED_MARKER}.{unique_suffix()}")
+    temp_marker.write_text(json.dumps(decompilation_inputs(version, side, decompiler)))
+    os.replace(temp_marker, marker)  # never a half written marker, even if the run is stopped here
+
+
+@contextlib.contextmanager
+def version_lock(version: str):
+    """Hold an exclusive lock on version for the whole run, a concurrent run of the same version waits for this one
+    and then finds its downloads and output instead of wiping and downloading them again."""
+    lock_path = (PATH_TO_ROOT_DIR / "versions" / f"{version}.lock")
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(lock_path, 'a+b') as lock_file:
+        if sys.platform.startswith('win'):
+            lock_file.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)  # gives up after 10 seconds, so retry
+                    break
+                except OSError:
+                    pass
+        else:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if sys.platform.startswith('win'):
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def unique_suffix() -> str:
+    """Tell apart the folders of runs of the same version, parallel runs are different processes."""
+    return f"{os.getpid()}_{time.time_ns():x}"
+
+
 def make_paths(version: str, side: SideType, removal_bool, force, forceno) -> str:
     path = (PATH_TO_ROOT_DIR / "mappings" / version)
     if not path.exists():
@@ -495,21 +929,18 @@ def make_paths(version: str, side: SideType, removal_bool, force, forceno) -> st
             shutil.rmtree(path)
             path.mkdir(parents=True)
 
+    # the removal flag is checked first, a run that does not clean up does not need to look at these files
     path = (PATH_TO_ROOT_DIR / "versions" / version)
     if not path.exists():
         path.mkdir(parents=True)
-    else:
-        path = (path / "version.json")
-        if path.is_file() and removal_bool:
-            path.unlink()
+    elif removal_bool:
+        (path / "version.json").unlink(missing_ok=True)
 
-    if (PATH_TO_ROOT_DIR / "versions").exists():
-        path = (PATH_TO_ROOT_DIR / "versions" / "version_manifest.json")
-        if path.is_file() and removal_bool:
-            path.unlink()
+    if removal_bool:
+        (PATH_TO_ROOT_DIR / "versions" / "version_manifest.json").unlink(missing_ok=True)
 
     path = (PATH_TO_ROOT_DIR / "versions" / version / f"{side}.jar")
-    if path.is_file() and removal_bool:
+    if removal_bool and path.is_file():
         if force:
             path = (PATH_TO_ROOT_DIR / "versions" / version)
             shutil.rmtree(path)
@@ -528,7 +959,7 @@ def make_paths(version: str, side: SideType, removal_bool, force, forceno) -> st
         if force:
             shutil.rmtree(path)
         elif forceno:
-            version = version + side + "_" + str(random.getrandbits(128))
+            version = version + side + "_" + unique_suffix()
             path = (PATH_TO_ROOT_DIR / "src" / version / side)
         else:
             aw = input(
@@ -536,82 +967,180 @@ def make_paths(version: str, side: SideType, removal_bool, force, forceno) -> st
             if aw == "w":
                 shutil.rmtree(path)
             elif aw == "n":
-                version = version + side + "_" + str(random.getrandbits(128))
+                version = version + side + "_" + unique_suffix()
                 path = (PATH_TO_ROOT_DIR / "src" / version / side)
             else:
                 sys.exit(-1)
         path.mkdir(parents=True)
 
-    path = (PATH_TO_ROOT_DIR / "tmp" / version / side)
-    if not path.exists():
-        path.mkdir(parents=True)
-    else:
-        if removal_bool:
-            shutil.rmtree(path)
-            path.mkdir(parents=True)
     return version
 
 
-def delete_dependencies(version: str, side: SideType) -> None:
-    path = (PATH_TO_ROOT_DIR / "tmp" / version / side)
-    temp_jar_path = (PATH_TO_ROOT_DIR / "src" / f"{version}-{side}-temp.jar")
-    with zipfile.ZipFile(temp_jar_path) as z:
-        z.extractall(path=path)
+def is_kept_entry(name: str) -> bool:
+    """Whether a jar entry survives delete_dependencies: bundled libraries live in other top level directories."""
+    parts = name.split('/')
+    if len(parts) > 1 and parts[0] not in KEPT_DIRECTORIES:
+        return False
+    return not (parts[0] == 'com' and len(parts) > 2 and parts[1] not in KEPT_DIRECTORIES)
 
-    for _dir in [join(path, "com"), path]:
-        for f in os.listdir(_dir):
-            if os.path.isdir(join(_dir, f)) and split(f)[-1] not in ['net', 'assets', 'data', 'mojang', 'com',
-                                                                     'META-INF']:
-                shutil.rmtree(join(_dir, f))
 
-    with zipfile.ZipFile(temp_jar_path, 'w') as z:
-        for f in glob.iglob(f'{path}{os.sep}**', recursive=True):
-            z.write(f, arcname=f[len(str(path)) + 1:])
+def copy_zip_entry(source: zipfile.ZipFile, target: zipfile.ZipFile, info: zipfile.ZipInfo) -> None:
+    """Stream one entry from an archive to another, nothing is extracted to disk."""
+    entry = zipfile.ZipInfo(info.filename, info.date_time)  # stored, as before the jar is not recompressed
+    entry.external_attr = info.external_attr
+    if info.is_dir():
+        target.writestr(entry, b"")
+        return
+    entry.file_size = info.file_size  # lets zipfile decide up front whether zip64 is needed
+    with source.open(info) as src, target.open(entry, 'w') as dst:
+        shutil.copyfileobj(src, dst, CHUNK_SIZE)
 
 
-def main():
-    check_java()
-    snapshot, latest = get_latest_version()
+def delete_dependencies(version: str, side: SideType) -> None:
+    temp_jar_path = (PATH_TO_ROOT_DIR / "src" / f"{version}-{side}-temp.jar")
+    filtered_jar_path = (PATH_TO_ROOT_DIR / "src" / f"{version}-{side}-filtered.jar")
+    with open(temp_jar_path, 'rb') as jar, zipfile.ZipFile(jar) as source, \
+            zipfile.ZipFile(filtered_jar_path, 'w') as target:
+        advise_sequential(jar)  # the entries are copied in the order they are stored
+        for info in source.infolist():
+            if is_kept_entry(info.filename):
+                copy_zip_entry(source, target, info)
+    os.replace(filtered_jar_path, temp_jar_path)
+
+
+def shard_jar(path: str, jobs: int) -> list[Path]:
+    """Split a jar into at most `jobs` jars holding about the same amount of classes, next to the original one.
+
+    Nested classes stay with their outer class and classes whose names only differ by case stay together, so a
+    decompiler run still sees them side by side. Everything that is not a class goes to the first shard."""
+    groups: dict[str, list[zipfile.ZipInfo]] = {}
+    with zipfile.ZipFile(path) as source:
+        for info in source.infolist():
+            # `a/Foo$Bar.class` goes with `a/Foo.class`, so the key is taken without the .class suffix
+            key = info.filename[:-6].split('$', 1)[0].lower() if info.filename.endswith('.class') else ''
+            groups.setdefault(key, []).append(info)
+        buckets: list[list[zipfile.ZipInfo]] = [groups.pop('', [])] + [[] for _ in range(jobs - 1)]
+        sizes = [0] * jobs
+        # biggest groups first, each one into the lightest shard so far
+        for group in sorted(groups.values(), key=lambda infos: sum(info.file_size for info in infos), reverse=True):
+            index = min(range(jobs), key=sizes.__getitem__)
+            buckets[index].extend(group)
+            sizes[index] += sum(info.file_size for info in group)
+        shards = []
+        for index, bucket in enumerate(bucket for bucket in buckets if bucket):
+            shard = Path(path).with_name(f"{Path(path).stem}-{index}.jar")
+            with zipfile.ZipFile(shard, 'w') as target:
+                for info in bucket:
+                    copy_zip_entry(source, target, info)
+            shards.append(shard)
+    return shards
+
+
+def extract_jar(path: Path, destination: Path) -> None:
+    """Extract the files of a jar, each directory is created only once and the files are written by a thread pool."""
+    created: set[Path] = set()
+    files: list[tuple[zipfile.ZipInfo, Path]] = []
+    with open(path, 'rb') as jar, zipfile.ZipFile(jar) as z:
+        advise_sequential(jar)
+        for info in sorted(z.infolist(), key=lambda info: info.header_offset):  # about sequential reads of the jar
+            # like extractall, never write outside of destination
+            target = destination.joinpath(*(part for part in info.filename.split('/') if part not in ('', '.', '..')))
+            if info.is_dir():
+                target.mkdir(parents=True, exist_ok=True)
+                created.add(target)
+                continue
+            if target.parent not in created:
+                target.parent.mkdir(parents=True, exist_ok=True)
+                created.add(target.parent)
+            files.append((info, target))
+
+        def extract(info: zipfile.ZipInfo, target: Path) -> None:
+            with z.open(info) as src, open(target, 'wb') as dst:
+                shutil.copyfileobj(src, dst, CHUNK_SIZE)
+
+        # zlib and the file system calls release the GIL, thousands of small files are mostly waiting on them
+        with ThreadPoolExecutor() as executor:
+            for extracted in [executor.submit(extract, info, target) for info, target in files]:
+                extracted.result()
+    drop_from_cache(path)
+
+
+def merge_tree(source: Path, destination: Path) -> None:
+    """Move every file under source to the same relative path under destination, then remove source."""
+    for root, _, files in os.walk(source):
+        target = destination / Path(root).relative_to(source)
+        target.mkdir(parents=True, exist_ok=True)
+        for file in files:
+            os.replace(join(root, file), target / file)
+    shutil.rmtree(source)
+
+
+def finish(decompiled_version: str, quiet, note: str = "") -> None:
+    """The end of a run, in one write."""
+    if not quiet:
+        print(f"===FINISHED===\nOutput is in /src/{decompiled_version}{note}", flush=True)
+
+
+@functools.lru_cache(maxsize=1)
+def build_parser() -> argparse.ArgumentParser:
+    """Build the command line parser once, the manual step flags are checked against --nauto after parsing."""
     # for arguments
     parser = argparse.ArgumentParser(description='Decompile Minecraft source code')
-    parser.add_argument('--mcversion', '-mcv', type=str, dest='mcversion',
-                        help=f"The version you want to decompile (alid version starting from 19w36a (snapshot) and 1.14.4 (releases))\n"
-                             f"Use 'snap' for latest snapshot ({snapshot}) or 'latest' for latest version ({latest})")
-    parser.add_argument('--side', '-s', type=str, dest='side', default="client",
-                        help='The side you want to decompile (either client or server)')
+    parser.add_argument('--mcversion', '-mcv', type=str, dest='mcversion', nargs='+',
+                        help="The version you want to decompile (valid version starting from 19w36a (snapshot) and 1.14.4 (releases))\n"
+                             "Use 'snap' for latest snapshot or 'latest' for latest version. "
+                             "Several versions are decompiled in parallel")
+    parser.add_argument('--side', '-s', type=str, dest='side', nargs='+', default=[CLIENT],
+                        help='The side you want to decompile (either client or server, or both)')
     parser.add_argument('--clean', '-c', dest='clean', action='store_true', default=False,
-                        help=f"Clean old runs")
+                        help="Clean old runs")
     parser.add_argument('--force', '-f', dest='force', action='store_true', default=False,
-                        help=f"Force resolve conflicts by replacing old files.")
+                        help="Force resolve conflicts by replacing old files.")
     parser.add_argument('--forceno', '-fn', dest='forceno', action='store_false', default=True,
-                        help=f"Force resolve conflicts by creating new directories.")
+                        help="Force resolve conflicts by creating new directories.")
     parser.add_argument('--decompiler', '-d', type=str, dest='decompiler', default="cfr",
-                        help=f"Choose between Fernflower and CFR.")
+                        help="Choose between Fernflower and CFR.")
     parser.add_argument('--nauto', '-na', dest='nauto', action='store_true', default=False,
-                        help=f"Choose between auto and manual mode.")
+                        help="Choose between auto and manual mode.")
     parser.add_argument('--download_mapping', '-dm', nargs='?', const=True, type=str2bool, dest='download_mapping',
-                        default=True,
-                        required="--nauto" in sys.argv or "-na" in sys.argv,
-                        help=f"Download the mappings (only if auto off)")
+                        default=None,
+                        help="Download the mappings (only if auto off)")
     parser.add_argument('--remap_mapping', '-rmap', nargs='?', const=True, type=str2bool, dest='remap_mapping',
-                        default=True,
-                        required="--nauto" in sys.argv or "-na" in sys.argv,
-                        help=f"Remap the mappings to tsrg (only if auto off)")
+                        default=None,
+                        help="Remap the mappings to tsrg (only if auto off)")
     parser.add_argument('--download_jar', '-dj', nargs='?', const=True, type=str2bool, dest='download_jar',
-                        default=True,
-                        required="--nauto" in sys.argv or "-na" in sys.argv,
-                        help=f"Download the jar (only if auto off)")
-    parser.add_argument('--remap_jar', '-rjar', nargs='?', const=True, type=str2bool, dest='remap_jar', default=True,
-                        required="--nauto" in sys.argv or "-na" in sys.argv, help=f"Remap the jar (only if auto off)")
-    parser.add_argument('--delete_dep', '-dd', nargs='?', const=True, type=str2bool, dest='delete_dep', default=True,
-                        required="--nauto" in sys.argv or "-na" in sys.argv,
-                        help=f"Delete the dependencies (only if auto off)")
-    parser.add_argument('--decompile', '-dec', nargs='?', const=True, type=str2bool, dest='decompile', default=True,
-                        required="--nauto" in sys.argv or "-na" in sys.argv, help=f"Decompile (only if auto off)")
+                        default=None,
+                        help="Download the jar (only if auto off)")
+    parser.add_argument('--remap_jar', '-rjar', nargs='?', const=True, type=str2bool, dest='remap_jar', default=None,
+                        help="Remap the jar (only if auto off)")
+    parser.add_argument('--delete_dep', '-dd', nargs='?', const=True, type=str2bool, dest='delete_dep', default=None,
+                        help="Delete the dependencies (only if auto off)")
+    parser.add_argument('--decompile', '-dec', nargs='?', const=True, type=str2bool, dest='decompile', default=None,
+                        help="Decompile (only if auto off)")
     parser.add_argument('--quiet', '-q', dest='quiet', action='store_true', default=False,
-                        help=f"Doesnt display the messages")
+                        help="Doesnt display the messages")
+    parser.add_argument('--skip-java-check', dest='skip_java_check', action='store_true', default=False,
+                        help="Use the java of the PATH without looking for a Java installation first")
+    parser.add_argument('--jobs', '-j', type=int, dest='jobs', default=1,
+                        help="Split the jar and run that many decompilers in parallel (each one can use up to 4G of memory)")
+    return parser
+
+
+def main():
     use_flags = False
+    parser = build_parser()
     args = parser.parse_args()
+    if args.nauto:
+        missing = [f'--{flag}' for flag in MANUAL_STEP_FLAGS if getattr(args, flag) is None]
+        if missing:
+            parser.error(f"the following arguments are required with --nauto: {', '.join(missing)}")
+    if args.mcversion and len(args.mcversion) * len(args.side) > 1:
+        # the runs go in parallel, nobody could answer their questions and their messages would interleave
+        if args.nauto or args.clean or not args.quiet:
+            parser.error("several versions or sides are only decompiled in auto mode, with --quiet and without --clean")
+    if args.skip_java_check:
+        os.environ[SKIP_JAVA_ENV] = "1"  # also seen by the processes of a parallel run
+    check_java()
     if args.mcversion:
         use_flags = True
     if not args.quiet:
@@ -620,105 +1149,104 @@ def main():
     if use_flags:
         removal_bool = args.clean
     else:
-        removal_bool = input("Do you want to clean up old runs? (y/N): ") in ["y", "yes"]
+        removal_bool = input("Do you want to clean up old runs? (y/N): ") in YES_ANSWERS
     if use_flags:
         decompiler = args.decompiler
     else:
         decompiler = input("Please input your decompiler choice: Fernflower or CFR (CFR/f): ")
-    decompiler = decompiler.lower() if decompiler.lower() in ["fernflower", "cfr", "f"] else "cfr"
+    is_cfr = decompiler.lower() not in FERNFLOWER_ANSWERS  # anything but fernflower falls back to cfr
     if use_flags:
-        version: str | None = args.mcversion
-        if version is None:
-            raise ValueError('You must provide a version with --mcversion <version, "latest", or "snap">')
+        versions: list[str] = args.mcversion
     else:
-        version = input(f"Please input a valid version starting from 19w36a (snapshot) or 1.14.4 (releases).\n" +
-                        f"Use 'snap' for the latest snapshot ({snapshot}) or 'latest' for the latest version ({latest}) :") or latest
-    if version in ["snap", "s", "snapshot"]:
-        version = snapshot
-    if version in ["latest", "l"]:
-        version = latest
+        snapshot, latest = get_latest_version()
+        versions = [input(f"Please input a valid version starting from 19w36a (snapshot) or 1.14.4 (releases).\n" +
+                          f"Use 'snap' for the latest snapshot ({snapshot}) or 'latest' for the latest version ({latest}) :") or latest]
+    # only hit the network for the latest versions when they are actually asked for
+    versions = [get_latest_version()[0] if version in SNAPSHOT_ALIASES else
+                get_latest_version()[1] if version in LATEST_ALIASES else version for version in versions]
     if use_flags:
-        side: str = args.side
+        sides: list[str] = args.side
     else:
-        side = input("Please select either client or server side (C/s) : ")
-    side = side.lower() if side.lower() in ("client", "server", "c", "s") else CLIENT
-    side = CLIENT if side in ("client", "c") else SERVER
+        sides = [input("Please select either client or server side (C/s) : ")]
+    sides = [SERVER if side.lower() in SERVER_ANSWERS else CLIENT for side in sides]
+    decompiler = "cfr" if is_cfr else "fernflower"
+    targets = list(dict.fromkeys((version, side) for version in versions for side in sides))
+    if len(targets) == 1:
+        run_locked(*targets[0], decompiler, removal_bool, use_flags, args)
+        return
+    get_global_manifest(args.quiet)  # once here, the runs then find it on disk
+    _downloader.close()  # forked workers would otherwise all share this process's kept-alive sockets
+    # the runs only share versions/, which the version lock protects, and mostly wait on downloads and java
+    with ProcessPoolExecutor(max_workers=min(len(targets), os.cpu_count() or 1)) as executor:
+        runs = [executor.submit(run_locked, version, side, decompiler, removal_bool, use_flags, args)
+                for version, side in targets]
+        for run_future in runs:
+            run_future.result()
+
+
+def run_locked(version: str, side: SideType, decompiler: str, removal_bool, use_flags, args: argparse.Namespace) -> None:
+    """run, once no other run of the same version is going on."""
+    with version_lock(version):
+        run(version, side, decompiler, removal_bool, use_flags, args)
+
+
+def run(version: str, side: SideType, decompiler: str, removal_bool, use_flags, args: argparse.Namespace) -> None:
+    """Everything after the questions, for one version and side."""
+    is_cfr = decompiler == "cfr"
+    # a scripted auto run that already completed for the same jar and mappings has nothing left to do
+    scripted_auto = use_flags and not args.nauto
+    if scripted_auto and not removal_bool and not args.force and is_decompiled(version, side, decompiler):
+        finish(version, args.quiet, " (already decompiled, use --force to decompile again)")
+        return
     decompiled_version = make_paths(version, side, removal_bool, args.force, args.forceno)
-    get_global_manifest(args.quiet)
+    # the java tools need the java version, start that JVM now so it runs behind the downloads and the zip work
+    threading.Thread(target=get_java_version, daemon=True).start()
     get_version_manifest(version, args.quiet)
+    if is_cfr:
+        decompile = functools.partial(decompile_cfr, decompiled_version, version, side, args.quiet, args.jobs)
+    else:
+        decompile = functools.partial(decompile_fern_flower, decompiled_version, version, side, args.quiet, args.force,
+                                      args.jobs)
     if use_flags:
         r = not args.nauto
     else:
         r = input("Auto mode? (Y/n): ") or "y"
         r = r.lower() == "y"
     if r:
-        get_mappings(version, side, args.quiet)
-        convert_mappings(version, side, args.quiet)
-        get_version_jar(version, side, args.quiet)
-        remap(version, side, args.quiet)
-        if decompiler.lower() == "cfr":
-            decompile_cfr(decompiled_version, version, side, args.quiet)
-        else:
-            decompile_fern_flower(decompiled_version, version, side, args.quiet, args.force)
-        if not args.quiet:
-            print("===FINISHED===")
-            print(f"Output is in /src/{decompiled_version}")
+        # the jar only depends on version.json, download it while the mappings are fetched and converted
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            jar_download = executor.submit(get_version_jar, version, side, args.quiet)
+            get_mappings(version, side, args.quiet)
+            convert_mappings(version, side, args.quiet)
+            jar_download.result()
+        remap(version, side, args.quiet, args.force)
+        decompile()
+        mark_decompiled(decompiled_version, version, side, decompiler)
+        finish(decompiled_version, args.quiet)
         return
 
-    if use_flags:
-        r = args.download_mapping
-    else:
-        r = input('Download mappings? (y/n): ') or "y"
-        r = r.lower() == "y"
-    if r:
-        get_mappings(version, side, args.quiet)
-
-    if use_flags:
-        r = args.remap_mapping
-    else:
-        r = input('Remap mappings to tsrg? (y/n): ') or "y"
-        r = r.lower() == "y"
-    if r:
-        convert_mappings(version, side, args.quiet)
-
-    if use_flags:
-        r = args.download_jar
-    else:
-        r = input(f'Get {version}-{side}.jar ? (y/n): ') or "y"
-        r = r.lower() == "y"
-    if r:
-        get_version_jar(version, side, args.quiet)
-
-    if use_flags:
-        r = args.remap_jar
-    else:
-        r = input('Remap? (y/n): ') or "y"
-        r = r.lower() == "y"
-    if r:
-        remap(version, side, args.quiet)
-
-    if use_flags:
-        r = args.delete_dep
-    else:
-        r = input('Delete Dependencies? (y/n): ') or "y"
-        r = r.lower() == "y"
-    if r:
-        delete_dependencies(version, side)
-
-    if use_flags:
-        r = args.decompile
-    else:
-        r = input('Decompile? (y/n): ') or "y"
-        r = r.lower() == "y"
-    if r:
-        if decompiler.lower() == "cfr":
-            decompile_cfr(decompiled_version, version, side, args.quiet)
+    # the manual steps, in order: the flag that enables each one, the question asked without flags and the step
+    steps = (
+        ('download_mapping', 'Download mappings? (y/n): ', functools.partial(get_mappings, version, side, args.quiet)),
+        ('remap_mapping', 'Remap mappings to tsrg? (y/n): ',
+         functools.partial(convert_mappings, version, side, args.quiet)),
+        ('download_jar', f'Get {version}-{side}.jar ? (y/n): ',
+         functools.partial(get_version_jar, version, side, args.quiet)),
+        ('remap_jar', 'Remap? (y/n): ', functools.partial(remap, version, side, args.quiet, args.force)),
+        ('delete_dep', 'Delete Dependencies? (y/n): ', functools.partial(delete_dependencies, version, side)),
+        ('decompile', 'Decompile? (y/n): ', decompile),
+    )
+    for flag, prompt, step in steps:
+        if use_flags:
+            r = getattr(args, flag)
         else:
-            decompile_fern_flower(decompiled_version, version, side, args.quiet, args.force)
-    if not args.quiet:
-        print("===FINISHED===")
-        print(f"Output is in /src/{decompiled_version}")
+            r = input(prompt) or "y"
+            r = r.lower() == "y"
+        if r:
+            step()
+    finish(decompiled_version, args.quiet)
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # the workers of a parallel run in the pyinstaller build
     main()